@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+import argparse
+import re
+import sys
+import numpy as np
+import pandas as pd
+import yaml
+
+# Percentile definitions students might get from Stata, R or Python defaults
+PERCENTILE_METHODS = [
+    "linear",
+    "averaged_inverted_cdf",
+    "inverted_cdf",
+    "hazen",
+    "weibull",
+    "median_unbiased",
+]
+
+# Tolerances are a fraction of the bootstrap standard error: results within it are
+# indistinguishable from correct, while analysis mistakes (wrong variable, dropped
+# observations) move estimates by more
+SE_FRACTION = 0.1
+# Margin over the spread between percentile definitions
+DEFINITION_MARGIN = 1.5
+# Smallest tolerance, to allow for rounding when results are written out
+MIN_TOLERANCE = 1e-4
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Calibrate per-key grading tolerances by bootstrapping the module's estimates"
+    )
+    parser.add_argument(
+        "--config", help="Specify YAML file containing results config", required=True
+    )
+    parser.add_argument(
+        "--data", help="Dataset to resample", default="data/raw/caschool.dta"
+    )
+    parser.add_argument(
+        "--replications", type=int, default=5000, help="Bootstrap replications. Default: 5000"
+    )
+    parser.add_argument(
+        "--batch", type=int, default=1000, help="Replications computed per batch. Default: 1000"
+    )
+    parser.add_argument("--seed", type=int, default=375, help="Random seed. Default: 375")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Print tolerances without updating the config"
+    )
+    return parser.parse_args()
+
+
+def gap(x: np.ndarray, method: str = "linear") -> np.ndarray:
+    """90th minus 10th percentile along the last axis"""
+    p10, p90 = np.percentile(x, [10, 90], axis=-1, method=method)
+    return p90 - p10
+
+
+def ols(y: np.ndarray, x: np.ndarray) -> tuple:
+    """Slope and constant of y on x along the last axis"""
+    x_mean = x.mean(axis=-1, keepdims=True)
+    y_mean = y.mean(axis=-1, keepdims=True)
+    slope = ((x - x_mean) * (y - y_mean)).sum(axis=-1) / ((x - x_mean) ** 2).sum(axis=-1)
+    constant = y_mean[..., 0] - slope * x_mean[..., 0]
+    return slope, constant
+
+
+def estimates(testscr: np.ndarray, str_: np.ndarray, method: str = "linear") -> dict:
+    """Compute all of the module's estimates; inputs are (replications, n) or (n,)"""
+    slope, constant = ols(testscr, str_)
+    return {
+        "avg_test_score": testscr.mean(axis=-1),
+        "avg_student_teacher_ratio": str_.mean(axis=-1),
+        "gap_test_score": gap(testscr, method),
+        "gap_student_teacher_ratio": gap(str_, method),
+        "ols_slope": slope,
+        "ols_constant": constant,
+    }
+
+
+def bootstrap(testscr: np.ndarray, str_: np.ndarray, replications: int, batch: int, seed: int) -> dict:
+    """Bootstrap all estimates together, resampling rows in (batch, n) index matrices"""
+    rng = np.random.default_rng(seed)
+    n = len(testscr)
+    draws = {}
+    for start in range(0, replications, batch):
+        idx = rng.integers(0, n, size=(min(batch, replications - start), n))
+        for key, values in estimates(testscr[idx], str_[idx]).items():
+            draws.setdefault(key, []).append(values)
+    return {key: np.concatenate(values) for key, values in draws.items()}
+
+
+def calibrate(testscr: np.ndarray, str_: np.ndarray, replications: int, batch: int, seed: int) -> dict:
+    point = estimates(testscr, str_)
+    draws = bootstrap(testscr, str_, replications, batch, seed)
+
+    # How much each estimate moves between percentile definitions on the full sample
+    by_method = [estimates(testscr, str_, method) for method in PERCENTILE_METHODS]
+
+    tolerances = {}
+    for key, value in point.items():
+        se = draws[key].std(ddof=1)
+        spread = max(abs(e[key] - value) for e in by_method)
+        tolerance = max(
+            SE_FRACTION * se / abs(value),
+            DEFINITION_MARGIN * spread / abs(value),
+            MIN_TOLERANCE,
+        )
+        tolerances[key] = float(f"{tolerance:.2g}")
+        print(
+            f"{key:<28} estimate {float(value):>10.4f}  se {se:>8.4f}  definition spread {float(spread):>8.4f}  tolerance {tolerances[key]:.2%}"
+        )
+    return tolerances
+
+
+def write_tolerances(filename: str, tolerances: dict):
+    """Replace the results_tolerance block of the config, leaving other lines untouched"""
+    with open(filename, "r") as f:
+        text = f.read()
+    text = re.sub(r"^results_tolerance:\n(?:[ \t]+.*\n?)*", "", text, flags=re.MULTILINE)
+    if not text.endswith("\n"):
+        text += "\n"
+    text += yaml.dump({"results_tolerance": tolerances}, sort_keys=False)
+    with open(filename, "w") as f:
+        f.write(text)
+
+
+def main() -> int:
+    args = parse_args()
+    data = pd.read_stata(args.data, columns=["testscr", "str"]).dropna()
+
+    tolerances = calibrate(
+        testscr=data["testscr"].to_numpy(dtype=np.float64),
+        str_=data["str"].to_numpy(dtype=np.float64),
+        replications=args.replications,
+        batch=args.batch,
+        seed=args.seed,
+    )
+
+    if not args.dry_run:
+        write_tolerances(args.config, tolerances)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+import argparse
+import fnmatch
+import hashlib
+import os
+import re
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import yaml
+
+FORMATS = [".dta", ".csv", ".xlsx"]
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Check that copies of each dataset in different formats agree"
+    )
+    parser.add_argument(
+        "--source", help="Specify YAML file describing the raw data", default="data/raw/source.yaml"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=100_000, help="Rows to read at a time. Default: 100000"
+    )
+    parser.add_argument(
+        "--max-mismatches",
+        type=int,
+        default=10,
+        help="Maximum mismatched cells to report per column. Default: 10",
+    )
+    parser.add_argument(
+        "--update-source",
+        action="store_true",
+        help="Record the canonical column hashes in the source YAML file",
+    )
+    return parser.parse_args()
+
+
+def load_config(filename: str) -> dict:
+    with open(filename, "r") as f:
+        config = yaml.load(f, Loader=yaml.SafeLoader)
+    return config
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a column name, e.g. 'Observation Number' -> 'observationnumber'"""
+    return re.sub(r"\W+", "", str(name).lower())
+
+
+def read_xlsx_chunks(path: str, chunksize: int):
+    from openpyxl import load_workbook
+
+    # openpyxl warns about Excel extensions it does not read, such as data validation
+    warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        columns = list(next(rows))
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunksize:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+
+def read_chunks(path: str, chunksize: int):
+    """Read a dataset in chunks of rows, whatever its format"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        # Read as text, so whether a column is numeric is decided by as_numbers()
+        # for the whole file rather than by pandas for each chunk
+        with pd.read_csv(path, chunksize=chunksize, encoding="utf-8-sig", dtype=str) as reader:
+            yield from reader
+    elif ext == ".dta":
+        with pd.read_stata(path, chunksize=chunksize) as reader:
+            yield from reader
+    elif ext == ".xlsx":
+        yield from read_xlsx_chunks(path, chunksize)
+    else:
+        raise ValueError(f"Unexpected data format: {ext}")
+
+
+def as_numbers(values: pd.Series):
+    """Normalize a column to float32, the precision of Stata's default float storage type
+
+    Returns:
+        np.ndarray: float32 values with missing values as NaN, or None if any
+        present value is not a number
+    """
+    if pd.api.types.is_bool_dtype(values):
+        return None
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float32, na_value=np.nan)
+    # Decide from the values rather than the chunk's dtype, which pandas infers
+    # from whichever rows happen to be in the chunk
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if kind not in ("empty", "string", "integer", "floating", "mixed-integer-float", "decimal"):
+        return None
+    numbers = pd.to_numeric(values, errors="coerce")
+    if (numbers.isna() & values.notna()).any():
+        return None
+    return numbers.to_numpy(dtype=np.float32, na_value=np.nan)
+
+
+def as_strings(values: pd.Series) -> np.ndarray:
+    """Normalize a column to stripped strings, with missing values as empty strings"""
+    return values.astype(object).where(values.notna(), "").astype(str).str.strip().to_numpy()
+
+
+def hash_numbers(h, values: np.ndarray):
+    # All NaN bit patterns hash the same
+    h.update(np.where(np.isnan(values), np.float32(np.nan), values).tobytes())
+
+
+def hash_strings(h, values: np.ndarray):
+    h.update("".join(f"{v}\x1f" for v in values).encode())
+
+
+def summarize_file(path: str, chunksize: int) -> dict:
+    """Compute per-column hashes and summary statistics, one chunk at a time
+
+    A column is numeric if every present value in the whole file is a number.
+    Until that is known, each column is hashed both as numbers and as strings,
+    so the hashes do not depend on where chunks start and end.
+    """
+    columns = {}
+    rows = 0
+    for chunk in read_chunks(path, chunksize):
+        rows += len(chunk)
+        for name in chunk.columns:
+            column = columns.get(normalize_name(name))
+            if column is None:
+                column = columns[normalize_name(name)] = {
+                    "name": str(name),
+                    "numeric": True,
+                    "numbers": hashlib.sha256(),
+                    "strings": hashlib.sha256(),
+                    "missing_numbers": 0,
+                    "missing_strings": 0,
+                    "sum": 0.0,
+                    "min": None,
+                    "max": None,
+                }
+            strings = as_strings(chunk[name])
+            hash_strings(column["strings"], strings)
+            column["missing_strings"] += int((strings == "").sum())
+
+            numbers = as_numbers(chunk[name]) if column["numeric"] else None
+            if numbers is None:
+                column["numeric"] = False
+                continue
+            hash_numbers(column["numbers"], numbers)
+            present = numbers[~np.isnan(numbers)]
+            column["missing_numbers"] += len(numbers) - len(present)
+            if len(present):
+                column["sum"] += float(present.astype(np.float64).sum())
+                lo, hi = float(present.min()), float(present.max())
+                column["min"] = lo if column["min"] is None else min(column["min"], lo)
+                column["max"] = hi if column["max"] is None else max(column["max"], hi)
+
+    summary = {}
+    for key, column in columns.items():
+        if column["numeric"]:
+            present = rows - column["missing_numbers"]
+            summary[key] = {
+                "name": column["name"],
+                "type": "numeric",
+                "sha256": column["numbers"].hexdigest(),
+                "missing": column["missing_numbers"],
+                "mean": column["sum"] / present if present else None,
+                "min": column["min"],
+                "max": column["max"],
+            }
+        else:
+            summary[key] = {
+                "name": column["name"],
+                "type": "string",
+                "sha256": column["strings"].hexdigest(),
+                "missing": column["missing_strings"],
+            }
+    return {"path": path, "rows": rows, "columns": summary}
+
+
+def match_columns(canonical: dict, other: dict) -> dict:
+    """Map canonical column keys to keys in other, allowing truncated names (e.g. Stata's 8 characters)"""
+    matched = {}
+    for key in canonical:
+        if key in other:
+            matched[key] = key
+            continue
+        candidates = [k for k in other if key.startswith(k) or k.startswith(key)]
+        if len(candidates) == 1:
+            matched[key] = candidates[0]
+    return matched
+
+
+def iter_aligned_rows(path_a: str, path_b: str, chunksize: int):
+    """Yield pairs of equal-length chunks from two files, reading both in lockstep"""
+    chunks_a = read_chunks(path_a, chunksize)
+    chunks_b = read_chunks(path_b, chunksize)
+    buffer_a = buffer_b = None
+    offset = 0
+    while True:
+        if buffer_a is None or not len(buffer_a):
+            buffer_a = next(chunks_a, None)
+        if buffer_b is None or not len(buffer_b):
+            buffer_b = next(chunks_b, None)
+        if buffer_a is None or buffer_b is None:
+            return
+        n = min(len(buffer_a), len(buffer_b))
+        yield offset, buffer_a.iloc[:n], buffer_b.iloc[:n]
+        offset += n
+        buffer_a = buffer_a.iloc[n:]
+        buffer_b = buffer_b.iloc[n:]
+
+
+def plain(value):
+    return float(value) if isinstance(value, np.floating) else value
+
+
+def find_mismatched_cells(
+    canonical: dict, other: dict, columns: dict, chunksize: int, max_mismatches: int
+) -> dict:
+    """List mismatched cells for columns whose hashes differ
+
+    Args:
+        columns: canonical column key -> column key in other
+    Returns:
+        dict: canonical column name -> list of (row, canonical value, other value)
+    """
+    mismatches = {key: [] for key in columns}
+    for offset, chunk_a, chunk_b in iter_aligned_rows(canonical["path"], other["path"], chunksize):
+        names_a = {normalize_name(name): name for name in chunk_a.columns}
+        names_b = {normalize_name(name): name for name in chunk_b.columns}
+        for key, other_key in columns.items():
+            if len(mismatches[key]) >= max_mismatches:
+                continue
+            if canonical["columns"][key]["type"] == other["columns"][other_key]["type"] == "numeric":
+                a = as_numbers(chunk_a[names_a[key]])
+                b = as_numbers(chunk_b[names_b[other_key]])
+                different = ~((a == b) | (np.isnan(a) & np.isnan(b)))
+            else:
+                a = as_strings(chunk_a[names_a[key]])
+                b = as_strings(chunk_b[names_b[other_key]])
+                different = a != b
+            for i in np.nonzero(different)[0][: max_mismatches - len(mismatches[key])]:
+                mismatches[key].append((offset + int(i), plain(a[i]), plain(b[i])))
+        if all(len(cells) >= max_mismatches for cells in mismatches.values()):
+            break
+    return {canonical["columns"][key]["name"]: cells for key, cells in mismatches.items() if cells}
+
+
+def group_files(source: dict, directory: str) -> dict:
+    """Group data files in directory by their source.yaml entry, in FORMATS order"""
+    groups = {}
+    files = sorted(os.listdir(directory))
+    for pattern in source:
+        matches = [
+            os.path.join(directory, f)
+            for f in files
+            if fnmatch.fnmatch(f, pattern) and os.path.splitext(f)[1].lower() in FORMATS
+        ]
+        if matches:
+            groups[pattern] = sorted(matches, key=lambda f: FORMATS.index(os.path.splitext(f)[1].lower()))
+    return groups
+
+
+def check_group(pattern: str, summaries: list, entry: dict, chunksize: int, max_mismatches: int) -> bool:
+    canonical = summaries[0]
+    ok = True
+    print(f"{pattern}: canonical copy {canonical['path']} ({canonical['rows']} rows)")
+
+    for other in summaries[1:]:
+        columns = match_columns(canonical["columns"], other["columns"])
+        if other["rows"] != canonical["rows"]:
+            ok = False
+            print(f"  ❌ {other['path']}: {other['rows']} rows")
+        for key, column in canonical["columns"].items():
+            if key not in columns:
+                ok = False
+                print(f"  ❌ {other['path']}: column {column['name']} not found")
+        different = {
+            key: other_key
+            for key, other_key in columns.items()
+            if canonical["columns"][key]["sha256"] != other["columns"][other_key]["sha256"]
+        }
+        if not different:
+            print(f"  ✅ {other['path']}: {len(columns)} columns agree")
+            continue
+        ok = False
+        cells = find_mismatched_cells(canonical, other, different, chunksize, max_mismatches)
+        for key, other_key in different.items():
+            a, b = canonical["columns"][key], other["columns"][other_key]
+            print(f"  ❌ {other['path']}: column {a['name']} differs")
+            if a["type"] == b["type"] == "numeric":
+                print(f"       mean {a['mean']} != {b['mean']}, min {a['min']} != {b['min']}, max {a['max']} != {b['max']}")
+            else:
+                print(f"       type {a['type']} vs {b['type']}, missing {a['missing']} vs {b['missing']}")
+            for row, x, y in cells.get(a["name"], []):
+                print(f"       row {row}: {x!r} != {y!r}")
+
+    recorded = (entry or {}).get("columns")
+    if recorded:
+        for key, column in canonical["columns"].items():
+            if recorded.get(column["name"]) != column["sha256"]:
+                ok = False
+                print(f"  ❌ column {column['name']} does not match the hash recorded in source.yaml")
+
+    return ok
+
+
+def str_presenter(dumper, data):
+    # Keep multi-line descriptions as literal blocks
+    if "\n" in data:
+        return dumper.represent_scalar("tag:yaml.org,2002:str", data, style="|")
+    return dumper.represent_scalar("tag:yaml.org,2002:str", data)
+
+
+def update_source(filename: str, source: dict, canonical: dict):
+    for pattern, summary in canonical.items():
+        source[pattern]["rows"] = summary["rows"]
+        source[pattern]["columns"] = {
+            column["name"]: column["sha256"] for column in summary["columns"].values()
+        }
+
+    yaml.add_representer(str, str_presenter)
+    # Keep a blank line between entries, as in the hand-written file
+    entries = [
+        yaml.dump({key: value}, allow_unicode=True, sort_keys=False, indent=4)
+        for key, value in source.items()
+    ]
+    with open(filename, "w") as f:
+        f.write("\n".join(entries))
+
+
+def main() -> int:
+    args = parse_args()
+    source = load_config(args.source)
+    groups = group_files(source, os.path.dirname(args.source) or ".")
+
+    # Summarize every file in parallel, each one streamed in chunks
+    paths = [path for files in groups.values() for path in files]
+    with ProcessPoolExecutor() as executor:
+        summaries = dict(
+            zip(paths, executor.map(summarize_file, paths, [args.chunksize] * len(paths)))
+        )
+
+    ok = True
+    for pattern, files in groups.items():
+        ok &= check_group(
+            pattern,
+            [summaries[path] for path in files],
+            None if args.update_source else source.get(pattern),
+            args.chunksize,
+            args.max_mismatches,
+        )
+
+    if args.update_source:
+        update_source(args.source, source, {pattern: summaries[files[0]] for pattern, files in groups.items()})
+
+    return 0 if ok else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
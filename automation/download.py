@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+CHUNK_BYTES = 16 * 1024 * 1024
+READ_BYTES = 1024 * 1024
+WORKERS = 4
+RETRIES = 5
+MAX_BACKOFF_SECONDS = 30
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Download a file with parallel, resumable HTTP range requests"
+    )
+    parser.add_argument("url", help="URL to download")
+    parser.add_argument("output", help="File to write")
+    parser.add_argument("--user", help="Username for HTTP basic authentication")
+    parser.add_argument(
+        "--password-env",
+        help="Name of the environment variable containing the password for HTTP basic authentication",
+    )
+    parser.add_argument("--sha256", help="Expected SHA-256 of the whole file")
+    parser.add_argument(
+        "--workers", type=int, default=WORKERS, help=f"Concurrent requests. Default: {WORKERS}"
+    )
+    return parser.parse_args()
+
+
+def open_url(url: str, auth: tuple = None, byte_range: tuple = None, method: str = "GET"):
+    request = urllib.request.Request(url, method=method)
+    if auth:
+        token = base64.b64encode(f"{auth[0]}:{auth[1]}".encode()).decode()
+        request.add_header("Authorization", f"Basic {token}")
+    if byte_range:
+        request.add_header("Range", f"bytes={byte_range[0]}-{byte_range[1]}")
+    return urllib.request.urlopen(request, timeout=60)
+
+
+def with_retries(func, retries: int = RETRIES):
+    """Call func, retrying network errors with bounded exponential backoff"""
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except urllib.error.HTTPError as e:
+            # Client errors such as a wrong password will not succeed on retry
+            if 400 <= e.code < 500 and e.code not in (408, 429):
+                raise
+            error = e
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            error = e
+        if attempt == retries:
+            raise error
+        delay = min(0.5 * 2**attempt, MAX_BACKOFF_SECONDS)
+        print(f"Download error ({error}), retrying in {delay:.1f}s", file=sys.stderr)
+        time.sleep(delay)
+
+
+def probe(url: str, auth: tuple) -> tuple:
+    """Find the size of the file and whether the server accepts range requests
+
+    Returns:
+        tuple: (size in bytes or None, accepts ranges, validator such as ETag)
+    """
+    with open_url(url, auth, byte_range=(0, 0)) as response:
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        content_range = response.headers.get("Content-Range", "")
+        if response.status == 206 and "/" in content_range:
+            size = content_range.rsplit("/", 1)[1]
+            return (int(size) if size.isdigit() else None), True, validator
+        size = response.headers.get("Content-Length")
+        return (int(size) if size else None), False, validator
+
+
+def load_state(state_file: str, size: int, chunk_bytes: int, validator: str) -> dict:
+    """Load progress of an earlier download, unless the remote file has changed"""
+    if os.path.isfile(state_file):
+        with open(state_file, "r") as f:
+            state = json.load(f)
+        if (
+            state.get("size") == size
+            and state.get("chunk_bytes") == chunk_bytes
+            and state.get("validator") == validator
+        ):
+            return state
+    return {"size": size, "chunk_bytes": chunk_bytes, "validator": validator, "chunks": {}}
+
+
+def hash_range(fd: int, start: int, length: int) -> str:
+    h = hashlib.sha256()
+    offset = start
+    while offset < start + length:
+        data = os.pread(fd, min(READ_BYTES, start + length - offset), offset)
+        if not data:
+            break
+        h.update(data)
+        offset += len(data)
+    return h.hexdigest()
+
+
+def fetch_chunk(url: str, auth: tuple, fd: int, start: int, end: int) -> str:
+    """Download bytes start..end (inclusive) into fd at the same offset
+
+    Returns:
+        str: SHA-256 of the chunk
+    """
+
+    def attempt():
+        h = hashlib.sha256()
+        offset = start
+        with open_url(url, auth, byte_range=(start, end)) as response:
+            if response.status != 206:
+                raise ValueError(f"Server ignored range request for bytes {start}-{end}")
+            for data in iter(lambda: response.read(READ_BYTES), b""):
+                os.pwrite(fd, data, offset)
+                h.update(data)
+                offset += len(data)
+        if offset != end + 1:
+            raise ValueError(f"Incomplete chunk: got bytes {start}-{offset - 1} of {start}-{end}")
+        return h.hexdigest()
+
+    return with_retries(attempt)
+
+
+def fetch_whole(url: str, auth: tuple, part_file: str):
+    """Download without range requests, for servers that do not support them"""
+
+    def attempt():
+        with open_url(url, auth) as response, open(part_file, "wb") as f:
+            for data in iter(lambda: response.read(READ_BYTES), b""):
+                f.write(data)
+
+    with_retries(attempt)
+
+
+def download(
+    url: str,
+    output: str,
+    auth: tuple = None,
+    sha256: str = None,
+    workers: int = WORKERS,
+    chunk_bytes: int = CHUNK_BYTES,
+):
+    """Download url to output in concurrent range requests, resuming from a partial file
+
+    Progress is kept in output.part and output.part.json, with a checksum for
+    each completed chunk. Completed chunks are re-verified when resuming and
+    downloaded again if their checksum no longer matches.
+
+    Args:
+        url: URL to download.
+        output: File to write.
+        auth: (username, password) for HTTP basic authentication, or None.
+        sha256: Expected SHA-256 of the whole file, or None.
+        workers: Number of concurrent range requests.
+        chunk_bytes: Size of each range request.
+    """
+    part_file = output + ".part"
+    state_file = part_file + ".json"
+
+    if sha256 and os.path.isfile(output):
+        fd = os.open(output, os.O_RDONLY)
+        try:
+            if hash_range(fd, 0, os.fstat(fd).st_size) == sha256:
+                print(f"Skipping download: {output} already matches its SHA-256")
+                return
+        finally:
+            os.close(fd)
+
+    size, ranges, validator = with_retries(lambda: probe(url, auth))
+
+    if not ranges or not size:
+        fetch_whole(url, auth, part_file)
+    else:
+        state = load_state(state_file, size, chunk_bytes, validator)
+        if not state["chunks"] and os.path.exists(part_file):
+            os.remove(part_file)
+
+        fd = os.open(part_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            starts = range(0, size, chunk_bytes)
+
+            # Keep chunks from an earlier attempt only if they are intact
+            done = {
+                start
+                for start in starts
+                if str(start) in state["chunks"]
+                and state["chunks"][str(start)] == hash_range(fd, start, min(chunk_bytes, size - start))
+            }
+            state["chunks"] = {str(start): state["chunks"][str(start)] for start in done}
+            todo = [start for start in starts if start not in done]
+            if done:
+                print(f"Resuming {output}: {len(done)} of {len(starts)} chunks already downloaded")
+
+            def save_state():
+                with open(state_file, "w") as f:
+                    json.dump(state, f)
+
+            save_state()
+            errors = []
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(
+                        fetch_chunk, url, auth, fd, start, min(start + chunk_bytes, size) - 1
+                    ): start
+                    for start in todo
+                }
+                # Record every chunk that succeeded, so a failed download can be resumed
+                for future in as_completed(futures):
+                    try:
+                        state["chunks"][str(futures[future])] = future.result()
+                        save_state()
+                    except Exception as e:
+                        errors.append(e)
+            if errors:
+                raise errors[0]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    if sha256:
+        fd = os.open(part_file, os.O_RDONLY)
+        try:
+            actual = hash_range(fd, 0, os.fstat(fd).st_size)
+        finally:
+            os.close(fd)
+        if actual != sha256:
+            os.remove(part_file)
+            if os.path.exists(state_file):
+                os.remove(state_file)
+            raise ValueError(f"SHA-256 mismatch for {url}: expected {sha256}, got {actual}")
+
+    os.replace(part_file, output)
+    if os.path.exists(state_file):
+        os.remove(state_file)
+
+
+def main() -> int:
+    args = parse_args()
+    auth = None
+    if args.user:
+        auth = (args.user, os.getenv(args.password_env, "") if args.password_env else "")
+    download(args.url, args.output, auth=auth, sha256=args.sha256, workers=args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
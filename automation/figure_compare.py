@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import numpy as np
+import yaml
+from PIL import Image, ImageColor
+
+from placeholder import PLACEHOLDER_COLOR, PLACEHOLDER_FONT, PLACEHOLDER_SIZE
+from placeholder_figures import render_placeholder_image
+
+# Side length of the grayscale thumbnail used for structural similarity
+SSIM_SIZE = 64
+SSIM_BLOCK = 8
+# Figures within this hash distance and above this SSIM of the reference
+# placeholder are placeholders, allowing for a different font or resizing
+PLACEHOLDER_DISTANCE = 8
+PLACEHOLDER_SSIM = 0.9
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Compare submitted figures against reference figures and group near-duplicates"
+    )
+    parser.add_argument(
+        "--config", help="Specify YAML file containing results config", required=True
+    )
+    parser.add_argument(
+        "--submissions",
+        nargs="+",
+        default=["."],
+        help="Directories containing submissions (repository checkouts). Default: current directory",
+    )
+    parser.add_argument(
+        "--reference",
+        help="Directory containing reference figures at the same relative paths",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=int,
+        default=6,
+        help="Maximum perceptual hash distance (out of 64 bits) for two figures to be near-duplicates. Default: 6",
+    )
+    parser.add_argument(
+        "--placeholder-font",
+        help="Font used to draw the reference placeholder figure. Default: paper/config/latinmodern-math.otf in this repository",
+        default=os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), PLACEHOLDER_FONT
+        ),
+    )
+    parser.add_argument(
+        "--output", help="Write comparison report in YAML to specified file", required=True
+    )
+    return parser.parse_args()
+
+
+def load_config(filename: str) -> dict:
+    with open(filename, "r") as f:
+        config = yaml.load(f, Loader=yaml.SafeLoader)
+    return config
+
+
+def decode_figure(img: Image.Image) -> tuple:
+    """Decode an image into the arrays used for comparison
+
+    Returns:
+        tuple: (9x8 grayscale array for the difference hash,
+                SSIM_SIZE x SSIM_SIZE grayscale array for structural similarity)
+    """
+    gray = img.convert("L")
+    small = np.asarray(gray.resize((9, 8), Image.Resampling.LANCZOS), dtype=np.float32)
+    thumb = np.asarray(
+        gray.resize((SSIM_SIZE, SSIM_SIZE), Image.Resampling.LANCZOS), dtype=np.float32
+    )
+    return small, thumb
+
+
+def has_placeholder_frame(img: Image.Image) -> bool:
+    """Check for the placeholder's fixed size and plain grey border"""
+    if img.size != PLACEHOLDER_SIZE:
+        return False
+    pixels = np.asarray(img.convert("RGB"))
+    border = np.concatenate([pixels[0], pixels[-1], pixels[:, 0], pixels[:, -1]])
+    return bool((border == ImageColor.getrgb(PLACEHOLDER_COLOR)).all())
+
+
+def load_figure(path: str) -> tuple:
+    """Load a figure for comparison
+
+    Returns:
+        tuple: (decode_figure() arrays, whether it has the placeholder's size and border)
+    """
+    with Image.open(path) as img:
+        return *decode_figure(img), has_placeholder_frame(img)
+
+
+def difference_hash(small: np.ndarray) -> np.ndarray:
+    """Compute 64-bit difference hashes for a stack of 9x8 images
+
+    Args:
+        small: array of shape (N, 8, 9)
+    Returns:
+        np.ndarray: boolean array of shape (N, 64)
+    """
+    return (small[:, :, 1:] > small[:, :, :-1]).reshape(len(small), -1)
+
+
+def hamming_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise Hamming distances between two stacks of hashes, shape (len(a), len(b))"""
+    return np.count_nonzero(a[:, None, :] != b[None, :, :], axis=2)
+
+
+def structural_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Mean block-wise SSIM between each thumbnail in a and the single thumbnail b
+
+    Args:
+        a: array of shape (N, SSIM_SIZE, SSIM_SIZE)
+        b: array of shape (SSIM_SIZE, SSIM_SIZE)
+    Returns:
+        np.ndarray: SSIM score per image in a, shape (N,)
+    """
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    n = SSIM_SIZE // SSIM_BLOCK
+
+    def blocks(x):
+        x = x.reshape(-1, n, SSIM_BLOCK, n, SSIM_BLOCK).transpose(0, 1, 3, 2, 4)
+        return x.reshape(x.shape[0], n, n, -1)
+
+    xa = blocks(a)
+    xb = blocks(b[None])
+    mu_a = xa.mean(axis=3)
+    mu_b = xb.mean(axis=3)
+    var_a = xa.var(axis=3)
+    var_b = xb.var(axis=3)
+    cov = ((xa - mu_a[..., None]) * (xb - mu_b[..., None])).mean(axis=3)
+
+    ssim = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / (
+        (mu_a**2 + mu_b**2 + c1) * (var_a + var_b + c2)
+    )
+    return ssim.mean(axis=(1, 2))
+
+
+def cluster_near_duplicates(distances: np.ndarray, threshold: int, order: np.ndarray) -> np.ndarray:
+    """Group items around leaders, so every member is within threshold of its leader
+
+    Items are visited in order. Each joins the nearest existing leader within
+    threshold, or becomes a new leader. Unlike single linkage, near-duplicates
+    cannot chain a distant item into a cluster.
+
+    Returns:
+        np.ndarray: cluster label per item, labels are the index of the leader
+    """
+    labels = np.full(len(distances), -1)
+    leaders = []
+    for i in order:
+        if leaders:
+            nearest = leaders[int(np.argmin(distances[i, leaders]))]
+            if distances[i, nearest] <= threshold:
+                labels[i] = nearest
+                continue
+        leaders.append(i)
+        labels[i] = i
+    return labels
+
+
+def compare_figure(
+    figure: str,
+    submissions: list,
+    reference: str,
+    placeholder: tuple,
+    threshold: int,
+) -> dict:
+    present = []
+    missing = []
+    unreadable = []
+    small = []
+    thumbs = []
+    framed = []
+
+    for submission in submissions:
+        path = os.path.join(submission, figure)
+        if not os.path.isfile(path):
+            missing.append(submission)
+            continue
+        try:
+            s, t, f = load_figure(path)
+        except OSError:
+            unreadable.append(submission)
+            continue
+        present.append(submission)
+        small.append(s)
+        thumbs.append(t)
+        framed.append(f)
+
+    report = {"missing": missing, "unreadable": unreadable, "clusters": []}
+    if not present:
+        return report
+
+    small = np.stack(small)
+    thumbs = np.stack(thumbs)
+    hashes = difference_hash(small)
+
+    # Placeholder figures have the size and background of placeholder_figures.py
+    # output, or look almost the same
+    placeholder_hash = difference_hash(placeholder[0][None])
+    placeholder_distance = hamming_matrix(hashes, placeholder_hash)[:, 0]
+    placeholder_ssim = structural_similarity(thumbs, placeholder[1])
+    is_placeholder = np.array(framed) | (
+        (placeholder_distance <= PLACEHOLDER_DISTANCE) & (placeholder_ssim >= PLACEHOLDER_SSIM)
+    )
+
+    reference_distance = reference_ssim = None
+    reference_path = os.path.join(reference, figure) if reference else None
+    if reference_path and os.path.isfile(reference_path):
+        ref_small, ref_thumb, _ = load_figure(reference_path)
+        reference_distance = hamming_matrix(hashes, difference_hash(ref_small[None]))[:, 0]
+        reference_ssim = structural_similarity(thumbs, ref_thumb)
+
+    # Leaders are the figures reviewed, so visit those closest to the reference first
+    if reference_ssim is not None:
+        order = np.argsort(-reference_ssim, kind="stable")
+    else:
+        order = np.arange(len(present))
+    distances = hamming_matrix(hashes, hashes)
+    labels = cluster_near_duplicates(distances, threshold, order)
+
+    for representative in np.unique(labels):
+        members = np.nonzero(labels == representative)[0]
+        cluster = {
+            "representative": present[representative],
+            # Hash distance of each member to the representative, at most threshold
+            "members": {present[i]: int(distances[i, representative]) for i in members},
+            "placeholder": bool(is_placeholder[members].all()),
+        }
+        if reference_ssim is not None:
+            cluster["reference_distance"] = int(reference_distance[representative])
+            cluster["reference_ssim"] = round(float(reference_ssim[representative]), 4)
+        report["clusters"].append(cluster)
+
+    report["placeholders"] = [present[i] for i in np.nonzero(is_placeholder)[0]]
+    return report
+
+
+def main() -> int:
+    args = parse_args()
+    config = load_config(args.config)
+
+    figures = [
+        path for path in config.get("results_created_files") or [] if path.endswith(".png")
+    ]
+    if not figures:
+        print("No figures to compare.")
+        return 0
+
+    placeholder = decode_figure(render_placeholder_image(args.placeholder_font, strict=True))
+
+    report = {}
+    for figure in figures:
+        report[figure] = compare_figure(
+            figure=figure,
+            submissions=args.submissions,
+            reference=args.reference,
+            placeholder=placeholder,
+            threshold=args.threshold,
+        )
+        print(
+            f"{figure}: {len(report[figure]['clusters'])} clusters, "
+            f"{len(report[figure].get('placeholders', []))} placeholders, "
+            f"{len(report[figure]['missing'])} missing, "
+            f"{len(report[figure]['unreadable'])} unreadable"
+        )
+
+    with open(args.output, "w") as f:
+        yaml.dump(report, f, allow_unicode=True, sort_keys=False)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
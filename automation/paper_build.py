@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import yaml
+
+from results_manifest import hash_file
+
+MUSTACHE_TAG = re.compile(r"\{\{\s*([^{}\s]+)\s*\}\}")
+# Raw LaTeX commands that read files when the PDF is compiled
+LATEX_FILE = re.compile(r"\\(?:VerbatimInput|includegraphics|input)(?:\[[^\]]*\])?\{([^}]+)\}")
+MARKDOWN_IMAGE = re.compile(r"!\[[^\]]*\]\(([^)\s]+)")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Typeset the paper, reusing the previous PDF if nothing it depends on changed"
+    )
+    parser.add_argument(
+        "--config", help="Specify YAML file containing results config", required=True
+    )
+    parser.add_argument("--output", help="Output file, e.g. paper.pdf", required=True)
+    parser.add_argument(
+        "--cache", help="Directory for the dependency graph and the cached PDF", default=".paper_build"
+    )
+    parser.add_argument(
+        "pandoc_args",
+        nargs=argparse.REMAINDER,
+        help="Additional arguments for pandoc, after --",
+    )
+    args = parser.parse_args()
+    if args.pandoc_args[:1] == ["--"]:
+        args.pandoc_args = args.pandoc_args[1:]
+    return args
+
+
+def load_config(filename: str) -> dict:
+    with open(filename, "r") as f:
+        config = yaml.load(f, Loader=yaml.SafeLoader)
+    return config
+
+
+def load_metadata(paper_text: str, input_files: list) -> dict:
+    """Combine the paper's YAML front matter with YAML input files such as formatting.yml"""
+    meta = {}
+    blocks = [paper_text]
+    for file in input_files:
+        if file.endswith((".yml", ".yaml")):
+            with open(file, "r") as f:
+                blocks.append(f.read())
+    for text in blocks:
+        match = re.match(r"^---\n(.*?)\n---\n", text, flags=re.DOTALL)
+        content = yaml.load(match.group(1), Loader=yaml.SafeLoader) if match else None
+        if isinstance(content, dict):
+            # As in pandoc, the first block to set a field wins
+            meta = dict(content, **meta)
+    return meta
+
+
+def as_list(value) -> list:
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def load_mustache_values(meta: dict) -> dict:
+    """Combine the YAML files listed under 'mustache', as pandoc-mustache does"""
+    values = {}
+    for file in as_list(meta.get("mustache")):
+        if os.path.isfile(file):
+            with open(file, "r") as f:
+                content = yaml.load(f, Loader=yaml.SafeLoader)
+            if isinstance(content, dict):
+                values.update(content)
+    return values
+
+
+def argument_files(pandoc_args: list) -> list:
+    """List the files named in pandoc arguments: input files, --filter, --template, ..."""
+    files = []
+    for arg in pandoc_args:
+        value = arg.split("=", 1)[1] if arg.startswith("--") and "=" in arg else arg
+        if os.path.isfile(value):
+            files.append(value)
+    return files
+
+
+def paper_dependencies(paper: str, pandoc_args: list, results_files: list) -> dict:
+    """Build the dependency graph of the paper: the inputs that change the PDF
+
+    Mustache keys are recorded by value, so results the paper does not use
+    do not trigger a rebuild. Files are recorded by content hash.
+    """
+    with open(paper, "r") as f:
+        text = f.read()
+    arg_files = argument_files(pandoc_args)
+    meta = load_metadata(text, arg_files)
+    values = load_mustache_values(meta)
+
+    keys = sorted(set(MUSTACHE_TAG.findall(text)))
+    files = set(LATEX_FILE.findall(text)) | set(MARKDOWN_IMAGE.findall(text))
+    files |= {file for file in results_files if file in text}
+    files |= set(arg_files) | set(as_list(meta.get("bibliography"))) | set(as_list(meta.get("csl")))
+    files.add(paper)
+
+    version = subprocess.run(["pandoc", "--version"], capture_output=True, text=True, check=True)
+    return {
+        "pandoc": version.stdout.splitlines()[0],
+        "pandoc_args": pandoc_args,
+        "keys": {key: values.get(key) for key in keys},
+        "files": {file: hash_file(file) if os.path.isfile(file) else None for file in sorted(files)},
+    }
+
+
+def fingerprint(graph: dict) -> str:
+    return hashlib.sha256(json.dumps(graph, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_graph(filename: str) -> dict:
+    if not os.path.isfile(filename):
+        return {}
+    with open(filename, "r") as f:
+        return json.load(f)
+
+
+def build(paper: str, results_files: list, output: str, pandoc_args: list, cache: str) -> bool:
+    """Typeset the paper with pandoc, unless the cached PDF has the same dependencies
+
+    Returns:
+        bool: True if pandoc was run, False if the cached PDF was reused
+    """
+    graph_file = os.path.join(cache, "graph.json")
+    cached_pdf = os.path.join(cache, "paper" + os.path.splitext(output)[1])
+
+    graph = paper_dependencies(paper, pandoc_args, results_files)
+    graph["fingerprint"] = fingerprint(graph)
+
+    if load_graph(graph_file).get("fingerprint") == graph["fingerprint"] and os.path.isfile(cached_pdf):
+        print(f"Reusing {cached_pdf}: the paper and the results it uses have not changed")
+        shutil.copyfile(cached_pdf, output)
+        return False
+
+    subprocess.run(["pandoc", paper] + pandoc_args + ["--output", output], check=True)
+
+    os.makedirs(cache, exist_ok=True)
+    shutil.copyfile(output, cached_pdf)
+    with open(graph_file, "w") as f:
+        json.dump(graph, f, indent=2)
+    return True
+
+
+def main() -> int:
+    args = parse_args()
+    config = load_config(args.config)
+
+    build(
+        paper=config["paper_typeset"],
+        results_files=config.get("results_created_files") or [],
+        output=args.output,
+        pandoc_args=args.pandoc_args,
+        cache=args.cache,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""
+Appearance of the placeholder figures drawn by placeholder_figures.py.
+
+Kept free of Pillow, so scripts that only read file headers can import it.
+"""
+
+# Placeholder figures are this size, with this background colour
+PLACEHOLDER_SIZE = (668, 486)
+PLACEHOLDER_COLOR = "grey"
+PLACEHOLDER_FONT = "paper/config/latinmodern-math.otf"
@@ -5,6 +5,8 @@ import sys
 import yaml
 from PIL import Image, ImageDraw, ImageFont
 
+from placeholder import PLACEHOLDER_COLOR, PLACEHOLDER_FONT, PLACEHOLDER_SIZE
+
 
 def parse_args() -> argparse.Namespace:
     """Parse command line arguments"""
@@ -31,17 +33,30 @@ def list_non_existent_images(paths: list, ext: list) -> list:
     return to_create
 
 
-def create_placeholder_image(path):
+def render_placeholder_image(font_path: str = PLACEHOLDER_FONT, strict: bool = False) -> Image.Image:
+    """Draw the placeholder figure
+
+    Args:
+        font_path: Font for the 'Placeholder' label.
+        strict: Raise an error if the font cannot be loaded, instead of leaving out the label.
+    """
     # Create a new image with light grey background
-    img = Image.new("RGB", (668, 486), color="grey")
+    img = Image.new("RGB", PLACEHOLDER_SIZE, color=PLACEHOLDER_COLOR)
 
     # Write 'Placeholder' in the center of the image
     try:
-        fnt = ImageFont.truetype("paper/config/latinmodern-math.otf", 40)
+        fnt = ImageFont.truetype(font_path, 40)
         d = ImageDraw.Draw(img)
         d.text((230, 200), "Placeholder", font=fnt, fill=(0, 0, 0))
-    except:
-        pass
+    except Exception as e:
+        if strict:
+            raise OSError(f"Could not load placeholder font {font_path}: {e}") from e
+
+    return img
+
+
+def create_placeholder_image(path):
+    img = render_placeholder_image()
 
     # Output
     img.save(path)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import yaml
+
+from placeholder import PLACEHOLDER_SIZE
+
+MANIFEST_FILENAME = "manifest.yaml"
+
+# Files at least this large are hashed in worker threads
+PARALLEL_HASH_BYTES = 8 * 1024 * 1024
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Verify created results files and write a content-hash manifest"
+    )
+    parser.add_argument(
+        "--config", help="Specify YAML file containing results config", required=True
+    )
+    parser.add_argument(
+        "--manifest",
+        help=f"Path to the manifest file. Default: {MANIFEST_FILENAME} in the directory of the first results file",
+    )
+    return parser.parse_args()
+
+
+def load_config(filename: str) -> dict:
+    with open(filename, "r") as f:
+        config = yaml.load(f, Loader=yaml.SafeLoader)
+    return config
+
+
+def default_manifest_path(files: list) -> str:
+    return os.path.join(os.path.dirname(files[0]) or ".", MANIFEST_FILENAME)
+
+
+def stat_files(files: list) -> dict:
+    """Stat files with a single directory scan per parent directory
+
+    Returns:
+        dict: path -> os.stat_result, or None if the path is not a regular file
+    """
+    by_directory = {}
+    for file in files:
+        directory, name = os.path.split(file)
+        by_directory.setdefault(directory or ".", {})[name] = file
+
+    stats = {file: None for file in files}
+    for directory, names in by_directory.items():
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name in names and entry.is_file():
+                        stats[names[entry.name]] = entry.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+    return stats
+
+
+def sniff_png(f) -> dict:
+    header = f.read(24)
+    if len(header) < 24 or header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+        return {"error": "not a valid PNG file"}
+    width, height = struct.unpack(">II", header[16:24])
+    # A complete PNG ends with an IEND chunk
+    f.seek(-12, os.SEEK_END)
+    if f.read(12)[4:8] != b"IEND":
+        return {"error": "PNG file is truncated"}
+    entry = {"type": "png", "width": width, "height": height}
+    # Only the header is read, so a figure of the placeholder's size is flagged, not rejected
+    if (width, height) == PLACEHOLDER_SIZE:
+        entry["warning"] = "possible placeholder figure: it has the size of the figures created by placeholder_figures.py"
+    return entry
+
+
+def sniff_jpeg(f) -> dict:
+    if f.read(2) != b"\xff\xd8":
+        return {"error": "not a valid JPEG file"}
+    # Walk segment headers until a start-of-frame marker, skipping segment bodies
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return {"error": "JPEG file is truncated"}
+        if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return {"error": "JPEG file is truncated"}
+        (length,) = struct.unpack(">H", length)
+        if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+            frame = f.read(5)
+            if len(frame) < 5:
+                return {"error": "JPEG file is truncated"}
+            height, width = struct.unpack(">HH", frame[1:5])
+            return {"type": "jpeg", "width": width, "height": height}
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def sniff_pdf(f) -> dict:
+    if not f.read(5) == b"%PDF-":
+        return {"error": "not a valid PDF file"}
+    # A complete PDF ends with an end-of-file marker
+    f.seek(0, os.SEEK_END)
+    f.seek(max(0, f.tell() - 1024))
+    if b"%%EOF" not in f.read():
+        return {"error": "PDF file is truncated"}
+    return {"type": "pdf"}
+
+
+def sniff_svg(f) -> dict:
+    if b"<svg" not in f.read(4096):
+        return {"error": "not a valid SVG file"}
+    return {"type": "svg"}
+
+
+SNIFFERS = {
+    ".png": sniff_png,
+    ".jpg": sniff_jpeg,
+    ".jpeg": sniff_jpeg,
+    ".pdf": sniff_pdf,
+    ".svg": sniff_svg,
+}
+
+
+def sniff_file(path: str, size: int) -> dict:
+    """Confirm the declared type of a file by reading only its header"""
+    if size == 0:
+        return {"error": "file is empty"}
+    sniffer = SNIFFERS.get(os.path.splitext(path)[1].lower())
+    if sniffer is None:
+        return {"type": os.path.splitext(path)[1].lower().lstrip(".") or "file"}
+    with open(path, "rb") as f:
+        return sniffer(f)
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(filename: str) -> dict:
+    if not os.path.isfile(filename):
+        return {}
+    with open(filename, "r") as f:
+        manifest = yaml.load(f, Loader=yaml.SafeLoader)
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def verify_files(files: list, manifest_path: str) -> dict:
+    """Verify results files, reusing manifest entries for files that have not changed
+
+    Returns:
+        dict: path -> entry with size, mtime_ns, sha256 and sniffed type, or None if missing
+    """
+    previous = load_manifest(manifest_path)
+    stats = stat_files(files)
+    entries = {}
+    to_hash = []
+
+    for file, st in stats.items():
+        if st is None:
+            entries[file] = None
+            continue
+        cached = previous.get(file)
+        if (
+            cached
+            and cached.get("size") == st.st_size
+            and cached.get("mtime_ns") == st.st_mtime_ns
+        ):
+            entries[file] = cached
+            continue
+        entries[file] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        entries[file].update(sniff_file(file, st.st_size))
+        to_hash.append(file)
+
+    large = [file for file in to_hash if entries[file]["size"] >= PARALLEL_HASH_BYTES]
+    small = [file for file in to_hash if entries[file]["size"] < PARALLEL_HASH_BYTES]
+    for file in small:
+        entries[file]["sha256"] = hash_file(file)
+    if large:
+        with ThreadPoolExecutor() as executor:
+            for file, digest in zip(large, executor.map(hash_file, large)):
+                entries[file]["sha256"] = digest
+
+    manifest = {file: entry for file, entry in entries.items() if entry is not None}
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    with open(manifest_path, "w") as f:
+        yaml.dump(manifest, f, sort_keys=False)
+
+    return entries
+
+
+def main() -> int:
+    args = parse_args()
+    config = load_config(args.config)
+
+    files = config.get("results_created_files")
+    if not files:
+        print("No results files to verify.")
+        return 0
+
+    entries = verify_files(files, args.manifest or default_manifest_path(files))
+    errors = False
+    for file, entry in entries.items():
+        if entry is None:
+            errors = True
+            print(f"missing: {file}")
+        elif "error" in entry:
+            errors = True
+            print(f"invalid: {file} ({entry['error']})")
+        elif "warning" in entry:
+            print(f"warning: {file} ({entry['warning']})")
+        else:
+            print(f"ok: {file} ({entry['sha256'][:12]})")
+
+    return 2 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
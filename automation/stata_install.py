@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
+import glob
+import hashlib
 import os
 import re
 import subprocess
 import sys
 from typing import List, Literal
 
+from download import download
+
+# Packages kept in the offline .deb bundle, see install_linux_dependencies()
+DEB_BUNDLE_PACKAGES = ['libtinfo5', 'libncurses5', 'age', 'gtk2-engines-pixbuf']
+DEB_BUNDLE_MANIFEST = 'SHA256SUMS'
+# Optional expected SHA-256 of files downloaded by this script, by file name
+DOWNLOADS_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stata_downloads.sha256')
+
 def parse_args() -> argparse.Namespace:
     """Parse command line arguments
     """
@@ -36,6 +47,10 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--install-age', action='store_true',
                         help="Install age encryption tool, even if not necessary for Stata install.")
 
+    parser.add_argument('--deb-bundle', type=str,
+                        default=None,
+                        help="Directory of pinned .deb files for Stata dependencies. Installed offline if complete, otherwise downloaded into first.")
+
     parser.add_argument('--add', nargs='*',
                         default=[],
                         help="List of additional packages to install, separated by spaces.")
@@ -114,7 +129,111 @@ def check_license_available(license_source: Literal["cache", "decrypt", "env", "
         raise ValueError(f'Unexpected license source: {license_source}')
 
 
-def install_linux_dependencies(install_source: str, license_source: str, install_age: bool) -> subprocess.CompletedProcess:
+def pinned_sha256(url: str) -> str:
+    """ Look up the expected SHA-256 of a download in DOWNLOADS_MANIFEST
+
+        Args:
+            url: URL of the file, matched on its file name.
+        Returns:
+            str: Expected SHA-256, or None if the file is not pinned, in which case the download is not verified.
+    """
+    filename = url.rsplit('/', 1)[-1]
+    if os.path.isfile(DOWNLOADS_MANIFEST):
+        with open(DOWNLOADS_MANIFEST, 'r') as f:
+            for line in f:
+                if line.strip() and not line.startswith('#'):
+                    checksum, name = line.split()
+                    if name == filename:
+                        return checksum
+    return None
+
+
+def deb_bundle_files(bundle_dir: str) -> dict:
+    """ List the .deb files recorded in a bundle's checksum manifest
+
+        Args:
+            bundle_dir: Directory containing the .deb files and the SHA256SUMS manifest.
+        Returns:
+            dict: package name -> (filename, sha256) for each file in the manifest.
+    """
+    manifest = os.path.join(bundle_dir, DEB_BUNDLE_MANIFEST)
+    if not os.path.isfile(manifest):
+        return {}
+
+    files = {}
+    with open(manifest, 'r') as f:
+        for line in f:
+            if line.strip():
+                checksum, filename = line.split()
+                files[filename.split('_')[0]] = (filename, checksum)
+    return files
+
+
+def deb_bundle_complete(bundle_dir: str, packages: List[str]) -> bool:
+    """ Check that a bundle contains every package and that checksums match
+
+        Args:
+            bundle_dir: Directory containing the .deb files and the SHA256SUMS manifest.
+            packages: Package names that must be in the bundle.
+        Returns:
+            bool: True if all packages are present with matching checksums.
+    """
+    files = deb_bundle_files(bundle_dir)
+
+    for pkg in packages:
+        if pkg not in files:
+            return False
+        filename, checksum = files[pkg]
+        path = os.path.join(bundle_dir, filename)
+        if not os.path.isfile(path):
+            return False
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).hexdigest() != checksum:
+                print_color(f'Checksum mismatch for {filename} in {bundle_dir}', "red")
+                return False
+    return True
+
+
+@contextlib.contextmanager
+def jammy_source():
+    """ Temporarily add the Ubuntu 22.04 (jammy) apt repository and update the package lists
+
+        libncurses5 and libtinfo5 are no longer in the Ubuntu 24.04 apt repository.
+    """
+    jammy_list = '/etc/apt/sources.list.d/jammy.list'
+    subprocess.run(f'echo "deb http://archive.ubuntu.com/ubuntu jammy main universe" | sudo tee {jammy_list}', shell=True, check=True)
+    try:
+        subprocess.run(['sudo', 'apt-get', 'update'], check=True)
+        yield
+    finally:
+        subprocess.run(['sudo', 'rm', '-f', jammy_list], check=True)
+
+
+def prepare_deb_bundle(bundle_dir: str):
+    """ Download the current versions of DEB_BUNDLE_PACKAGES into a bundle and record their checksums
+
+        The versions downloaded here are pinned by the manifest until the bundle is deleted.
+
+        Args:
+            bundle_dir: Directory to download the .deb files into.
+    """
+    print_color(f'Preparing .deb bundle in {bundle_dir}: {", ".join(DEB_BUNDLE_PACKAGES)}', "green")
+    os.makedirs(bundle_dir, exist_ok=True)
+
+    with jammy_source():
+        for pkg in DEB_BUNDLE_PACKAGES:
+            for old_file in glob.glob(os.path.join(bundle_dir, f'{pkg}_*.deb')):
+                os.remove(old_file)
+            subprocess.run(['apt-get', 'download', pkg], cwd=bundle_dir, check=True)
+
+    with open(os.path.join(bundle_dir, DEB_BUNDLE_MANIFEST), 'w') as f:
+        for pkg in DEB_BUNDLE_PACKAGES:
+            filename = os.path.basename(sorted(glob.glob(os.path.join(bundle_dir, f'{pkg}_*.deb')))[-1])
+            with open(os.path.join(bundle_dir, filename), 'rb') as deb:
+                f.write(f'{hashlib.sha256(deb.read()).hexdigest()}  {filename}\n')
+
+
+def install_linux_dependencies(install_source: str, license_source: str, install_age: bool, deb_bundle: str = None) -> subprocess.CompletedProcess:
     """ Install Stata dependencies, and the 'age' encryption tool if necessary
 
         Resolves the following errors:
@@ -122,16 +241,24 @@ def install_linux_dependencies(install_source: str, license_source: str, install
         - stata: error while loading shared libraries: libncurses.so.5: cannot open shared object file: No such file or directory
         - xstata: Gtk-WARNING **: ##:##:##.###: Unable to locate theme engine in module_path: "pixmap"
 
+        If deb_bundle is specified, packages are installed offline with dpkg from that directory,
+        downloading the bundle first if it is incomplete. apt-get is only used as a fallback.
+
         Args:
             install_source (str): The source type of the Stata installation.
             license_source (str): The source type of the Stata license.
             install_age (bool): Whether to install 'age'
+            deb_bundle (str): Directory of pinned .deb files, or None to install from apt.
         Returns:
             subprocess.CompletedProcess: The output of 'dpkg -l' prior to the installation of additional packages in this function.
     """
     installed_packages = subprocess.run(['dpkg', '-l'], capture_output=True, text=True)
     to_install = []
 
+    if deb_bundle and not deb_bundle_complete(deb_bundle, DEB_BUNDLE_PACKAGES):
+        prepare_deb_bundle(deb_bundle)
+    bundled = deb_bundle_files(deb_bundle) if deb_bundle else {}
+
     def package_is_available(package_name: str) -> bool:
         available_packages = subprocess.run(['apt-cache', 'search', package_name], capture_output=True, text=True)
 
@@ -147,14 +274,11 @@ def install_linux_dependencies(install_source: str, license_source: str, install
             return False
 
     # Identify packages to install
+    # Availability from apt is checked at install time, once the jammy repository is added
     for pkg in ['libtinfo5', 'libncurses5']:
 
-        if package_is_installed(pkg, installed_packages.stdout):
-            pass
-        elif package_is_available(pkg):
+        if not package_is_installed(pkg, installed_packages.stdout):
             to_install.append(pkg)
-        else:
-            print_color(f"Warning: {pkg} not installed or available from apt, Stata might not run without it", "red")
 
     if (install_source == 'decrypt' or license_source == 'decrypt' or install_age) and not package_is_installed('age', installed_packages.stdout):
         to_install.append('age')
@@ -162,11 +286,30 @@ def install_linux_dependencies(install_source: str, license_source: str, install
     if window_manager_present(installed_packages) and not package_is_installed('gtk2-engines-pixbuf', installed_packages.stdout):
         to_install.append('gtk2-engines-pixbuf')
 
-    # Install packages
+    # Install packages from the bundle without touching the network
+    bundle_failed = False
+    if to_install and all(pkg in bundled for pkg in to_install):
+        print_color(f'Installing packages from {deb_bundle}: {", ".join(to_install)}', "green")
+        debs = [os.path.join(deb_bundle, bundled[pkg][0]) for pkg in to_install]
+        result = subprocess.run(['sudo', 'dpkg', '--install'] + debs, check=False)
+        if result.returncode == 0:
+            to_install = []
+        else:
+            # e.g. a bundled package depends on one that is neither bundled nor installed
+            bundle_failed = True
+            print_color(f'Warning: could not install packages from {deb_bundle}, falling back to apt', "red")
+
+    # Install packages, from the jammy repository where they are no longer in the current release
     if to_install:
         print_color(f'Installing apt packages: {", ".join(to_install)}', "green")
-        subprocess.run(['sudo', 'apt-get', 'update'], check=True)
-        subprocess.run(['sudo', 'apt-get', 'install', '-y'] + to_install, check=True)
+        with jammy_source():
+            for pkg in ['libtinfo5', 'libncurses5']:
+                if pkg in to_install and not package_is_available(pkg):
+                    print_color(f"Warning: {pkg} not installed or available from apt, Stata might not run without it", "red")
+                    to_install.remove(pkg)
+            # --fix-broken completes packages dpkg left unconfigured with missing dependencies
+            fix_broken = ['--fix-broken'] if bundle_failed else []
+            subprocess.run(['sudo', 'apt-get', 'install', '-y'] + fix_broken + to_install, check=True)
         subprocess.run(['sudo', 'apt-get', 'clean'], check=True)
         subprocess.run(['sudo', 'rm', '-rf', '/var/lib/apt/lists/*'], check=True)
 
@@ -191,11 +334,12 @@ def install_stata(install_source: Literal['cache', 'decrypt', 'password'], versi
     elif install_source == 'decrypt':
         private_key = os.getenv('STATA_AGE_PRIVATE_KEY')
         url = f'https://github.com/ECO481-Stepner/files/releases/download/files/St{version}Linux64.encrypted'
+        encrypted_file = f'/tmp/statafiles/Stata{version}Linux64.encrypted'
         installer_file = f'/tmp/statafiles/Stata{version}Linux64.tar.gz'
-        cmd = (f'wget --progress=dot:giga -qO- {url} | '
-               f'age --decrypt --identity <(echo "{private_key}") --output {installer_file}')
-        
+        cmd = f'age --decrypt --identity <(echo "{private_key}") --output {installer_file} {encrypted_file}'
+
         os.makedirs('/tmp/statafiles', exist_ok=True)
+        download(url, encrypted_file, sha256=pinned_sha256(url))
         subprocess.run(cmd, shell=True, executable='/bin/bash', check=True)
     elif install_source == 'password':
         url_base = os.getenv('STATA_URL_BASE')
@@ -205,7 +349,7 @@ def install_stata(install_source: Literal['cache', 'decrypt', 'password'], versi
         download_password = os.getenv('STATA_URL_PW')
 
         os.makedirs('/tmp/statafiles', exist_ok=True)
-        subprocess.run(['wget', '--progress=dot:giga', '--user', download_username, '--password', download_password, '-O', installer_file, url_installer], check=True)
+        download(url_installer, installer_file, auth=(download_username, download_password), sha256=pinned_sha256(url_installer))
 
     os.chdir('/tmp/statafiles')
     subprocess.run(['tar', '-xzf', installer_file], check=True)
@@ -289,10 +433,16 @@ Y
         download_username = 'oi'
         download_password = os.getenv('STATA_URL_PW')
 
+        # Download outside /usr/local/stata, where only stata.lic is writable
+        os.makedirs('/tmp/statafiles_license', exist_ok=True)
+        download(url_license, '/tmp/statafiles_license/stata.lic', auth=(download_username, download_password), sha256=pinned_sha256(url_license))
+
         subprocess.run(['sudo', 'touch', 'stata.lic'], check=True)
         subprocess.run(['sudo', 'chmod', 'a+w', 'stata.lic'], check=True)
-        subprocess.run(['wget', '--user', download_username, '--password', download_password, '-O', license_file, url_license], check=True)
+        with open('/tmp/statafiles_license/stata.lic', 'r') as src, open(license_file, 'w') as dst:
+            dst.write(src.read())
         subprocess.run(['sudo', 'chmod', 'a-w', 'stata.lic'], check=True)
+        subprocess.run(['rm', '-r', '/tmp/statafiles_license'], check=True)
     else:
         raise ValueError(f'Unexpected license source: {license_source}')
     
@@ -408,7 +558,7 @@ require using packages-stata.txt, install
         else:
             print_color("Installing add-on: Stata package 'project' from password-protected URL", "green")
             os.makedirs('/tmp/statafiles_project/ado', exist_ok=True)
-            subprocess.run(['wget', '--user', download_username, '--password', download_password, '-O', project_file, url_project], check=True)
+            download(url_project, project_file, auth=(download_username, download_password), sha256=pinned_sha256(url_project))
             subprocess.run(['unzip', project_file, '-d', '/tmp/statafiles_project/ado'], check=True)
 
             input_data = """
@@ -476,7 +626,7 @@ def main() -> int:
     args = parse_args()
     working_dir = os.getcwd()
     check_license_available(args.license_source)
-    installed_packages = install_linux_dependencies(args.install_source, args.license_source, args.install_age)
+    installed_packages = install_linux_dependencies(args.install_source, args.license_source, args.install_age, args.deb_bundle)
     install_stata(args.install_source, args.version, working_dir)
     install_stata_license(args.license_source, args.interactive, working_dir)
     finish_stata_install(args.install_source, args.edition, args.no_upgrade, installed_packages)
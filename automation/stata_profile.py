@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import re
+import sys
+
+# Stata prints "r; t=0.52 10:15:32" after each command when `set rmsg on`
+RMSG_PATTERN = re.compile(r"^r;\s+t=\s*([\d.]+)")
+# `timer list` prints "   1:      0.52 /        1 =       0.5200"
+TIMER_PATTERN = re.compile(r"^\s*(\d+):\s+([\d.]+)\s+/\s+(\d+)\s+=\s+([\d.]+)")
+# Commands are echoed as ". command"; loop bodies ("  2. command") are timed with their loop
+COMMAND_PATTERN = re.compile(r"^\.\s?(.*)$")
+SMCL_TAG_PATTERN = re.compile(r"\{(?:[a-zA-Z_]+)(?:[^{}]*)\}")
+
+PREFIXES = {"quietly", "qui", "noisily", "noi", "capture", "cap", "by", "bys", "bysort"}
+ABBREVIATIONS = {
+    "forv": "forvalues",
+    "forval": "forvalues",
+    "g": "generate",
+    "gen": "generate",
+    "reg": "regress",
+    "sum": "summarize",
+    "su": "summarize",
+    "tab": "tabulate",
+}
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Profile a Stata log produced with `set rmsg on` and/or `timer list`"
+    )
+    parser.add_argument("log", help="Stata .log or .smcl file to profile")
+    parser.add_argument(
+        "--do-file", help="Do-file that produced the log, to attribute time to its lines"
+    )
+    parser.add_argument(
+        "--top", type=int, default=20, help="Number of rows to print. Default: 20"
+    )
+    parser.add_argument(
+        "--output-json", help="Write flame graph input in JSON to specified file"
+    )
+    return parser.parse_args()
+
+
+def clean_line(line: str, smcl: bool) -> str:
+    line = line.rstrip("\r\n")
+    if smcl:
+        line = SMCL_TAG_PATTERN.sub("", line)
+    return line
+
+
+def command_name(command: str) -> str:
+    """Return the full Stata command name, ignoring prefixes such as quietly and by"""
+    if ":" in command and command.split()[0] in PREFIXES:
+        command = command.split(":", 1)[1]
+    words = command.split()
+    while words and words[0] in PREFIXES:
+        words = words[1:]
+    if not words:
+        return "(none)"
+    return ABBREVIATIONS.get(words[0], words[0])
+
+
+def is_log_close(command: str) -> bool:
+    # The log ends before rmsg reports the command that closes it
+    words = command.replace(":", " ").split()
+    return [w for w in words if w not in PREFIXES][:2] == ["log", "close"]
+
+
+def iter_timed_commands(filename: str):
+    """Stream (command, seconds) pairs from a Stata log in constant memory
+
+    Continuation lines ("> ...") are joined to the preceding command. Loop body
+    lines are attributed to the loop, since rmsg reports the loop as one command.
+    A command still running when the log ends, e.g. because the build timed out,
+    is yielded last with seconds None.
+    """
+    smcl = filename.lower().endswith(".smcl")
+    command = None
+    with open(filename, "r", errors="replace") as f:
+        for raw in f:
+            line = clean_line(raw, smcl)
+            match = RMSG_PATTERN.match(line)
+            if match:
+                if command is not None:
+                    yield command, float(match.group(1))
+                command = None
+                continue
+            match = COMMAND_PATTERN.match(line)
+            if match:
+                command = match.group(1).strip() or None
+                continue
+            if command is not None and line.startswith("> "):
+                command += " " + line[2:].strip()
+    if command is not None and not is_log_close(command):
+        yield command, None
+
+
+def iter_timers(filename: str):
+    """Stream (timer, total seconds, count) tuples from `timer list` output"""
+    smcl = filename.lower().endswith(".smcl")
+    with open(filename, "r", errors="replace") as f:
+        for raw in f:
+            match = TIMER_PATTERN.match(clean_line(raw, smcl))
+            if match:
+                yield int(match.group(1)), float(match.group(2)), int(match.group(3))
+
+
+def normalize(command: str) -> str:
+    # The log echoes /// continuation markers, locate_lines() drops them
+    return " ".join(command.replace("///", " ").split())
+
+
+def locate_lines(do_file: str) -> list:
+    """List (line number, normalized command) for each command in a do-file"""
+    lines = []
+    pending = None
+    with open(do_file, "r", errors="replace") as f:
+        for number, line in enumerate(f, start=1):
+            text = line.strip()
+            if pending is None and (not text or text.startswith("*")):
+                continue
+            # Join continuation lines marked with ///
+            if text.endswith("///"):
+                text = text[:-3]
+                pending = (pending[0], pending[1] + " " + text) if pending else (number, text)
+                continue
+            if pending:
+                text = pending[1] + " " + text
+                number = pending[0]
+                pending = None
+            lines.append((number, normalize(text)))
+    return lines
+
+
+def profile(filename: str, do_file: str = None) -> dict:
+    by_command = {}
+    by_line = {}
+    unfinished = []
+    total = 0.0
+    source = locate_lines(do_file) if do_file else []
+    position = 0
+
+    for command, seconds in iter_timed_commands(filename):
+        # Commands are echoed in order, so search forward from the previous match
+        key = normalize(command)
+        line = None
+        for i in range(position, len(source)):
+            if source[i][1].startswith(key) or key.startswith(source[i][1]):
+                position = i + 1
+                line = source[i][0]
+                break
+
+        if seconds is None:
+            unfinished.append({"command": key, "line": line})
+            continue
+
+        total += seconds
+        name = command_name(command)
+        stats = by_command.setdefault(name, {"count": 0, "seconds": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["seconds"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+
+        if line is not None:
+            entry = by_line.setdefault(line, {"command": key, "count": 0, "seconds": 0.0})
+        else:
+            entry = by_line.setdefault(None, {"command": "(unmatched)", "count": 0, "seconds": 0.0})
+        entry["count"] += 1
+        entry["seconds"] += seconds
+
+    timers = {
+        timer: {"seconds": seconds, "count": count}
+        for timer, seconds, count in iter_timers(filename)
+    }
+
+    return {
+        "total": total,
+        "commands": by_command,
+        "lines": by_line,
+        "timers": timers,
+        "unfinished": unfinished,
+    }
+
+
+def flame_graph(result: dict, name: str) -> dict:
+    """Build a nested {name, value, children} tree: log -> command -> line"""
+    children = {}
+    for line, entry in result["lines"].items():
+        label = f"line {line}: {entry['command']}" if line is not None else entry["command"]
+        cmd = command_name(entry["command"]) if line is not None else "(unmatched)"
+        node = children.setdefault(cmd, {"name": cmd, "value": 0.0, "children": []})
+        node["value"] += entry["seconds"]
+        node["children"].append({"name": label, "value": entry["seconds"]})
+
+    if not children:
+        children = {
+            cmd: {"name": cmd, "value": stats["seconds"]}
+            for cmd, stats in result["commands"].items()
+        }
+
+    return {
+        "name": name,
+        "value": result["total"],
+        "children": list(children.values()),
+        # Commands still running when the log ended, which have no elapsed time
+        "unfinished": result["unfinished"],
+    }
+
+
+def print_table(result: dict, top: int):
+    for entry in result["unfinished"]:
+        where = f"line {entry['line']}: " if entry["line"] is not None else ""
+        print(f"⏱️ Unfinished when the log ended (elapsed time unknown): {where}{entry['command'][:60]}")
+    if result["unfinished"]:
+        print("")
+    print(f"Total time reported by rmsg: {result['total']:.2f}s")
+    print("")
+    print(f"{'command':<20} {'count':>8} {'seconds':>10} {'max':>10} {'share':>7}")
+    commands = sorted(result["commands"].items(), key=lambda x: -x[1]["seconds"])
+    for name, stats in commands[:top]:
+        share = stats["seconds"] / result["total"] if result["total"] else 0
+        print(
+            f"{name:<20} {stats['count']:>8} {stats['seconds']:>10.2f} {stats['max']:>10.2f} {share:>7.1%}"
+        )
+
+    lines = [(line, entry) for line, entry in result["lines"].items() if line is not None]
+    if lines:
+        print("")
+        print(f"{'line':>6} {'seconds':>10}  command")
+        for line, entry in sorted(lines, key=lambda x: -x[1]["seconds"])[:top]:
+            print(f"{line:>6} {entry['seconds']:>10.2f}  {entry['command'][:60]}")
+
+    if result["timers"]:
+        print("")
+        print(f"{'timer':>6} {'seconds':>10} {'count':>8}")
+        for timer, stats in sorted(result["timers"].items(), key=lambda x: -x[1]["seconds"]):
+            print(f"{timer:>6} {stats['seconds']:>10.2f} {stats['count']:>8}")
+
+
+def main() -> int:
+    args = parse_args()
+    result = profile(args.log, args.do_file)
+    print_table(result, args.top)
+
+    if args.output_json:
+        with open(args.output_json, "w") as f:
+            json.dump(flame_graph(result, args.do_file or args.log), f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import resource
+import signal
+import subprocess
+import sys
+import time
+import yaml
+
+# Defaults for the submission_limits section of the config
+DEFAULT_LIMITS = {
+    "cpu_seconds": 720,
+    "address_space_mb": 12288,
+    "file_size_mb": 1024,
+    "output_mb": 256,
+}
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Run a submission under resource limits and record the resources it used"
+    )
+    parser.add_argument(
+        "--config", help="Specify YAML file containing results config", required=True
+    )
+    parser.add_argument(
+        "--log", help="Write the submission's output to specified file", required=True
+    )
+    parser.add_argument(
+        "--metrics", help="Write resource metrics in YAML to specified file", required=True
+    )
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="Command to run, after --")
+    args = parser.parse_args()
+    if args.command[:1] == ["--"]:
+        args.command = args.command[1:]
+    if not args.command:
+        parser.error("no command specified")
+    return args
+
+
+def load_config(filename: str) -> dict:
+    with open(filename, "r") as f:
+        config = yaml.load(f, Loader=yaml.SafeLoader)
+    return config
+
+
+def set_limits(limits: dict):
+    """Apply rlimits in the child process, before the submission starts"""
+    mb = 1024 * 1024
+    # A null or zero limit is not applied
+    rlimits = [
+        (resource.RLIMIT_CPU, limits["cpu_seconds"]),
+        (resource.RLIMIT_AS, (limits["address_space_mb"] or 0) * mb),
+        (resource.RLIMIT_FSIZE, (limits["file_size_mb"] or 0) * mb),
+    ]
+    for rlimit, value in rlimits:
+        if not value:
+            continue
+        # The CPU soft limit sends SIGXCPU, the hard limit a few seconds later kills
+        hard = value + 5 if rlimit == resource.RLIMIT_CPU else value
+        current_hard = resource.getrlimit(rlimit)[1]
+        if current_hard != resource.RLIM_INFINITY:
+            value, hard = min(value, current_hard), min(hard, current_hard)
+        resource.setrlimit(rlimit, (value, hard))
+
+
+def run_metered(command: list, log_file: str, limits: dict) -> dict:
+    """Run command, copying its output to stdout and log_file, and meter its resource use
+
+    Returns:
+        dict: metrics, including the exit code and the limit that was exceeded, if any
+    """
+    output_limit = limits["output_mb"] * 1024 * 1024 if limits["output_mb"] else None
+    output_bytes = 0
+    exceeded = None
+
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        preexec_fn=lambda: set_limits(limits),
+        start_new_session=True,
+    )
+    with open(log_file, "wb") as log:
+        for chunk in iter(lambda: proc.stdout.read1(65536), b""):
+            output_bytes += len(chunk)
+            if output_limit and output_bytes > output_limit:
+                exceeded = "output_mb"
+                os.killpg(proc.pid, signal.SIGKILL)
+                break
+            log.write(chunk)
+            sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+    proc.stdout.close()
+
+    # wait4 reports the resources used by the submission and the children it waited for
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.monotonic() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    # Exceeding address_space_mb is not reported here: allocations fail inside the
+    # submission (MemoryError, Stata r(909)), which exits with its own error
+    cpu = usage.ru_utime + usage.ru_stime
+    if proc.returncode < 0 and exceeded is None:
+        if -proc.returncode == signal.SIGXCPU:
+            exceeded = "cpu_seconds"
+        elif -proc.returncode == signal.SIGXFSZ:
+            exceeded = "file_size_mb"
+        # The hard CPU limit kills with SIGKILL, as does the kernel's OOM killer
+        elif -proc.returncode == signal.SIGKILL and limits["cpu_seconds"] and cpu >= limits["cpu_seconds"]:
+            exceeded = "cpu_seconds"
+
+    return {
+        "exit_code": proc.returncode if proc.returncode >= 0 else 128 - proc.returncode,
+        "limit_exceeded": exceeded,
+        "wall_seconds": round(wall, 2),
+        "cpu_seconds": round(cpu, 2),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "io_read_bytes": usage.ru_inblock * 512,
+        "io_write_bytes": usage.ru_oublock * 512,
+        "output_bytes": output_bytes,
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    config = load_config(args.config)
+    limits = dict(DEFAULT_LIMITS, **(config.get("submission_limits") or {}))
+
+    metrics = run_metered(args.command, args.log, limits)
+
+    with open(args.metrics, "w") as f:
+        yaml.dump(metrics, f, sort_keys=False)
+
+    if metrics["limit_exceeded"]:
+        print(
+            f"Submission stopped: exceeded {metrics['limit_exceeded']} limit of {limits[metrics['limit_exceeded']]}",
+            file=sys.stderr,
+        )
+    return metrics["exit_code"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,9 @@ import sys
 import textwrap
 import yaml
 
+from results_manifest import default_manifest_path, verify_files
+from validation_history import record_outcomes
+
 
 def parse_args() -> argparse.Namespace:
     """Parse command line arguments"""
@@ -24,6 +27,22 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--output-yaml", help="Write validation results in YAML to specified file"
     )
+    parser.add_argument(
+        "--metrics", help="YAML file of resource metrics written by submission_run.py"
+    )
+    parser.add_argument(
+        "--history", help="Record validation outcomes in the specified SQLite database"
+    )
+    parser.add_argument(
+        "--submission-id",
+        help="Submission identifier for --history. Default: $GITHUB_REPOSITORY",
+        default=os.getenv("GITHUB_REPOSITORY", "local"),
+    )
+    parser.add_argument(
+        "--commit",
+        help="Commit of the submission for --history. Default: $GITHUB_SHA",
+        default=os.getenv("GITHUB_SHA"),
+    )
     return parser.parse_args()
 
 
@@ -86,13 +105,24 @@ def load_correct_results(json_string: str) -> dict:
 
 
 def compare_results(
-    submitted: dict, correct: dict, input_file: str, output_html: str, output_yaml: str
+    submitted: dict,
+    correct: dict,
+    input_file: str,
+    output_html: str,
+    output_yaml: str,
+    outcomes: list = None,
+    tolerances: dict = None,
 ) -> bool:
     validation_output = []
     errors = False
+    if outcomes is None:
+        outcomes = []
 
     def reldif(a, b):
-        return abs(a - b) / a
+        return abs(a - b) / abs(a)
+
+    # Relative tolerance per key, calibrated by calibrate_tolerances.py
+    tolerances = tolerances or {}
 
     validated = {"VALIDATED_COUNT": 0}
 
@@ -101,7 +131,7 @@ def compare_results(
             errors = True
             validation_output.append(f"⭕️ no value submitted for <code>{key}</code>")
             validated["VALIDATED_" + key] = "⭕️"
-        elif reldif(value, submitted[key]) > 0.01:
+        elif reldif(value, submitted[key]) > tolerances.get(key, 0.01):
             errors = True
             validation_output.append(
                 f"❌ {submitted[key]} is not the correct result for <code>{key}</code>"
@@ -112,6 +142,16 @@ def compare_results(
             validated["VALIDATED_" + key] = "✅"
             validated["VALIDATED_COUNT"] += 1
 
+        outcomes.append(
+            {
+                "key": key,
+                "submitted": submitted.get(key),
+                "correct": value,
+                "relative_error": reldif(value, submitted[key]) if key in submitted else None,
+                "status": validated["VALIDATED_" + key],
+            }
+        )
+
     with open(output_html, "w") as f:
         if errors:
             f.write(
@@ -140,10 +180,22 @@ def compare_results(
 def check_files_exist(files: list, output_file: str) -> bool:
     validation_output = []
     errors = False
-    for file in files:
-        if not os.path.isfile(file):
+    entries = verify_files(files, default_manifest_path(files))
+    for file, entry in entries.items():
+        if entry is None:
             errors = True
             validation_output.append(f"⭕️ did not find <code>{file}</code>")
+        elif "error" in entry:
+            errors = True
+            validation_output.append(
+                f"⭕️ <code>{file}</code> is not valid: {entry['error']}"
+            )
+        elif "warning" in entry:
+            validation_output.append(f"🟡 <code>{file}</code> is a {entry['warning']}")
+        elif "width" in entry:
+            validation_output.append(
+                f"🟢 <code>{file}</code> ({entry['width']}×{entry['height']} {entry['type'].upper()})"
+            )
         else:
             validation_output.append(f"🟢 <code>{file}</code>")
 
@@ -151,7 +203,7 @@ def check_files_exist(files: list, output_file: str) -> bool:
     with open(output_file, "a") as f:
         if errors:
             f.write(
-                "<h1>⭕️ Results Files Validation</h1> Some expected results files were not created: <ul>"
+                "<h1>⭕️ Results Files Validation</h1> Some expected results files were not created or are not valid: <ul>"
             )
         else:
             f.write(
@@ -161,20 +213,72 @@ def check_files_exist(files: list, output_file: str) -> bool:
             f.write(f"<li>{line}</li>")
         f.write("</ul>")
         f.write(
-            "<i>This check only verifies the files exist, not whether they are correct. The files will be graded manually.</i>"
+            "<i>This check only verifies the files exist and are readable, not whether they are correct. The files will be graded manually.</i>"
         )
 
     return not errors
 
 
+def report_metrics(metrics_file: str, output_file: str, output_yaml: str):
+    with open(metrics_file, "r") as f:
+        metrics = yaml.load(f, Loader=yaml.SafeLoader)
+
+    # Append resource usage to existing file
+    with open(output_file, "a") as f:
+        if metrics.get("limit_exceeded"):
+            f.write(
+                f"<h1>🛑 Resource Usage</h1> Your code was stopped because it exceeded the <code>{metrics['limit_exceeded']}</code> limit: <ul>"
+            )
+        else:
+            f.write("<h1>📊 Resource Usage</h1> Resources used by your code: <ul>")
+        f.write(f"<li>Wall time: {metrics['wall_seconds']} seconds</li>")
+        f.write(f"<li>CPU time: {metrics['cpu_seconds']} seconds</li>")
+        f.write(f"<li>Peak memory: {metrics['peak_rss_mb']} MB</li>")
+        f.write(
+            f"<li>Disk I/O: {metrics['io_read_bytes']} bytes read, {metrics['io_write_bytes']} bytes written</li>"
+        )
+        f.write(f"<li>Output: {metrics['output_bytes']} bytes</li>")
+        f.write("</ul>")
+
+    if output_yaml:
+        validated = {}
+        if os.path.isfile(output_yaml):
+            with open(output_yaml, "r") as f:
+                validated = yaml.load(f, Loader=yaml.SafeLoader) or {}
+        for key, value in metrics.items():
+            validated["METRIC_" + key] = value
+        with open(output_yaml, "w") as f:
+            yaml.dump(validated, f, allow_unicode=True)
+
+
+def missing_outcomes(correct: dict) -> list:
+    """Outcomes for a run without usable results: every key counts as missing"""
+    return [{"key": key, "correct": value, "status": "⭕️"} for key, value in correct.items()]
+
+
+def record_history(filename: str, outcomes: list, submission_id: str, commit: str):
+    for outcome in outcomes:
+        outcome["submission_id"] = submission_id
+        outcome["commit_sha"] = commit
+    record_outcomes(filename, outcomes)
+
+
 def main() -> int:
     args = parse_args()
     config = load_config(args.config)
 
-    valid_yaml = check_submitted_results_are_valid(
-        filename=config["results_submitted_path"], output_file=args.output
-    )
-
+    try:
+        valid_yaml = check_submitted_results_are_valid(
+            filename=config["results_submitted_path"], output_file=args.output
+        )
+    except yaml.YAMLError:
+        # Record the run before reporting the error, so failure shares include it
+        if args.history:
+            outcomes = missing_outcomes(load_correct_results(args.correct))
+            record_history(args.history, outcomes, args.submission_id, args.commit)
+        raise
+
+    outcomes = []
     if valid_yaml:
         results_match = compare_results(
             submitted=load_submitted_results(config["results_submitted_path"]),
@@ -182,9 +286,16 @@ def main() -> int:
             input_file=config["results_submitted_path"],
             output_html=args.output,
             output_yaml=args.output_yaml,
+            outcomes=outcomes,
+            tolerances=config.get("results_tolerance"),
         )
     else:
         results_match = False
+        if args.history:
+            outcomes = missing_outcomes(load_correct_results(args.correct))
+
+    if args.history and outcomes:
+        record_history(args.history, outcomes, args.submission_id, args.commit)
 
     if config.get("results_created_files"):
         files_exist = check_files_exist(
@@ -193,6 +304,13 @@ def main() -> int:
     else:
         files_exist = True
 
+    if args.metrics and os.path.isfile(args.metrics):
+        report_metrics(
+            metrics_file=args.metrics,
+            output_file=args.output,
+            output_yaml=args.output_yaml,
+        )
+
     if valid_yaml and results_match and files_exist:
         return 0
     else:
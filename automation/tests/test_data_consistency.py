@@ -0,0 +1,33 @@
+import os
+import pandas as pd
+import pytest
+
+from data_consistency import summarize_file
+
+RAW = os.path.join(os.path.dirname(__file__), "..", "..", "data", "raw")
+
+
+def hashes(path: str, chunksize: int) -> dict:
+    summary = summarize_file(path, chunksize)
+    return {key: (column["type"], column["sha256"]) for key, column in summary["columns"].items()}
+
+
+@pytest.mark.parametrize("name", ["caschool.dta", "caschool.csv", "caschool.xlsx", "auto.dta"])
+def test_hashes_do_not_depend_on_chunksize(name):
+    path = os.path.join(RAW, name)
+    expected = hashes(path, 100_000)
+    for chunksize in [1, 7, 419]:
+        assert hashes(path, chunksize) == expected
+
+
+def test_column_type_is_decided_for_whole_file(tmp_path):
+    # Chunks of 2 rows: the first chunk of "code" looks numeric, the second does not
+    path = tmp_path / "mixed.csv"
+    pd.DataFrame({"code": ["1", "2", "A3", ""], "value": ["", "", "1.5", "2"]}).to_csv(path, index=False)
+
+    summary = summarize_file(str(path), 2)
+    assert summary["columns"]["code"]["type"] == "string"
+    assert summary["columns"]["code"]["missing"] == 1
+    assert summary["columns"]["value"]["type"] == "numeric"
+    assert summary["columns"]["value"]["missing"] == 2
+    assert hashes(str(path), 2) == hashes(str(path), 100)
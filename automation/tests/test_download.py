@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import download as dl
+
+CONTENT = os.urandom(10_000)
+CHUNK = 1000
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serve CONTENT with Range support, misbehaving as configured on the server"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.headers.get("Range"))
+            count = len(server.requests)
+        if server.status:
+            self.send_error(server.status)
+            return
+
+        start, end = 0, len(CONTENT) - 1
+        byte_range = self.headers.get("Range")
+        if server.ranges and byte_range:
+            first, last = byte_range.split("=")[1].split("-")
+            start, end = int(first), min(int(last), len(CONTENT) - 1)
+            if start in server.refuse:
+                self.send_error(503)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(CONTENT)}")
+        else:
+            self.send_response(200)
+        body = CONTENT[start : end + 1]
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+        if server.drop_every and count % server.drop_every == 0:
+            # Send part of the body, then drop the connection
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(dl.time, "sleep", lambda seconds: None)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.status = None
+    httpd.ranges = True
+    httpd.refuse = set()
+    httpd.drop_every = 0
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/file.bin"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_dropped_connections_are_retried(server, tmp_path):
+    server.drop_every = 3
+    output = str(tmp_path / "file.bin")
+    dl.download(server.url, output, sha256=hashlib.sha256(CONTENT).hexdigest(), chunk_bytes=CHUNK)
+
+    with open(output, "rb") as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(output + ".part")
+    assert not os.path.exists(output + ".part.json")
+
+
+def test_resume_from_partial_download(server, tmp_path):
+    output = str(tmp_path / "file.bin")
+    server.refuse = {3000, 7000}
+    with pytest.raises(urllib.error.HTTPError):
+        dl.download(server.url, output, chunk_bytes=CHUNK, workers=1)
+
+    with open(output + ".part.json", "r") as f:
+        state = json.load(f)
+    assert set(state["chunks"]) == {str(start) for start in range(0, 10_000, CHUNK)} - {"3000", "7000"}
+
+    # Damage a saved chunk: it should be downloaded again rather than trusted
+    with open(output + ".part", "r+b") as f:
+        f.seek(5000)
+        f.write(b"\0" * 10)
+
+    server.refuse = set()
+    server.requests.clear()
+    dl.download(server.url, output, chunk_bytes=CHUNK)
+
+    fetched = sorted(r for r in server.requests if r != "bytes=0-0")
+    assert fetched == ["bytes=3000-3999", "bytes=5000-5999", "bytes=7000-7999"]
+    with open(output, "rb") as f:
+        assert f.read() == CONTENT
+
+
+def test_client_errors_are_not_retried(server, tmp_path):
+    server.status = 401
+    with pytest.raises(urllib.error.HTTPError) as error:
+        dl.download(server.url, str(tmp_path / "file.bin"), auth=("oi", "wrong"))
+    assert error.value.code == 401
+    assert len(server.requests) == 1
+
+
+def test_server_without_range_support(server, tmp_path):
+    server.ranges = False
+    output = str(tmp_path / "file.bin")
+    dl.download(server.url, output, chunk_bytes=CHUNK)
+
+    with open(output, "rb") as f:
+        assert f.read() == CONTENT
+    assert all(r is None for r in server.requests[1:])
+
+
+def test_checksum_mismatch(server, tmp_path):
+    output = str(tmp_path / "file.bin")
+    with pytest.raises(ValueError, match="SHA-256 mismatch"):
+        dl.download(server.url, output, sha256="0" * 64, chunk_bytes=CHUNK)
+    assert not os.path.exists(output)
+    assert not os.path.exists(output + ".part")
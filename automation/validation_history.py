@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+import argparse
+import sqlite3
+import sys
+import uuid
+from datetime import datetime, timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outcomes (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    submission_id TEXT NOT NULL,
+    commit_sha TEXT,
+    key TEXT NOT NULL,
+    submitted REAL,
+    correct REAL,
+    relative_error REAL,
+    status TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outcomes_key ON outcomes (key, status);
+CREATE INDEX IF NOT EXISTS outcomes_submission ON outcomes (submission_id, run_id);
+"""
+
+COLUMNS = [
+    "run_id",
+    "submission_id",
+    "commit_sha",
+    "key",
+    "submitted",
+    "correct",
+    "relative_error",
+    "status",
+    "timestamp",
+]
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Query the history of validation outcomes")
+    parser.add_argument("--db", help="SQLite database of validation outcomes", required=True)
+    subparsers = parser.add_subparsers(dest="query", required=True)
+
+    subparsers.add_parser("keys", help="Share of submissions with each status, per key")
+
+    student = subparsers.add_parser("student", help="Latest outcomes of one submission")
+    student.add_argument("submission_id")
+
+    values = subparsers.add_parser("values", help="Most common incorrect values for a key")
+    values.add_argument("key")
+    values.add_argument("--top", type=int, default=10)
+
+    return parser.parse_args()
+
+
+def connect(filename: str) -> sqlite3.Connection:
+    con = sqlite3.connect(filename)
+    # Write-ahead logging lets queries run while a batch is being inserted
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.executescript(SCHEMA)
+    return con
+
+
+def record_outcomes(filename: str, outcomes: list):
+    """Insert validation outcomes in a single transaction
+
+    Args:
+        filename: SQLite database, created if it does not exist
+        outcomes: list of dicts with keys in COLUMNS; run_id defaults to a new id
+            for this call, timestamp to now (UTC)
+    """
+    defaults = {
+        "run_id": uuid.uuid4().hex,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="microseconds"),
+    }
+    rows = [tuple(outcome.get(c, defaults.get(c)) for c in COLUMNS) for outcome in outcomes]
+    con = connect(filename)
+    try:
+        with con:
+            con.executemany(
+                f"INSERT INTO outcomes ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows,
+            )
+    finally:
+        con.close()
+
+
+# Only the latest run of each submission counts towards cohort statistics. Runs
+# recorded with the same timestamp are ordered by when they were inserted.
+LATEST = """
+SELECT o.* FROM outcomes o
+JOIN (
+    SELECT submission_id, run_id,
+           ROW_NUMBER() OVER (
+               PARTITION BY submission_id ORDER BY MAX(timestamp) DESC, MAX(id) DESC
+           ) AS position
+    FROM outcomes
+    GROUP BY submission_id, run_id
+) latest USING (submission_id, run_id)
+WHERE latest.position = 1
+"""
+
+
+def query_keys(con: sqlite3.Connection) -> list:
+    return con.execute(
+        f"""
+        SELECT key,
+               COUNT(*) AS submissions,
+               AVG(status = '✅') AS correct,
+               AVG(status = '❌') AS incorrect,
+               AVG(status = '⭕️') AS missing
+        FROM ({LATEST})
+        GROUP BY key
+        ORDER BY incorrect DESC, key
+        """
+    ).fetchall()
+
+
+def query_student(con: sqlite3.Connection, submission_id: str) -> list:
+    return con.execute(
+        f"""
+        SELECT key, status, submitted, correct, relative_error, commit_sha, timestamp
+        FROM ({LATEST})
+        WHERE submission_id = ?
+        ORDER BY key
+        """,
+        (submission_id,),
+    ).fetchall()
+
+
+def query_values(con: sqlite3.Connection, key: str, top: int) -> list:
+    return con.execute(
+        f"""
+        SELECT submitted, COUNT(*) AS submissions
+        FROM ({LATEST})
+        WHERE key = ? AND status = '❌'
+        GROUP BY submitted
+        ORDER BY submissions DESC
+        LIMIT ?
+        """,
+        (key, top),
+    ).fetchall()
+
+
+def main() -> int:
+    args = parse_args()
+    con = connect(args.db)
+
+    if args.query == "keys":
+        print(f"{'key':<32} {'n':>6} {'correct':>8} {'wrong':>8} {'missing':>8}")
+        for key, n, correct, incorrect, missing in query_keys(con):
+            print(f"{key:<32} {n:>6} {correct:>8.0%} {incorrect:>8.0%} {missing:>8.0%}")
+    elif args.query == "student":
+        for key, status, submitted, correct, error, commit, timestamp in query_student(
+            con, args.submission_id
+        ):
+            error = f"{error:.2%}" if error is not None else ""
+            print(f"{status} {key:<32} {submitted!s:>14} {correct!s:>14} {error:>10}  {commit or ''} {timestamp}")
+    elif args.query == "values":
+        for submitted, n in query_values(con, args.key, args.top):
+            print(f"{submitted!s:>14} {n:>6}")
+
+    con.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Write results to a YAML file in the format expected by the automated grading.
+
+Only uses the Python standard library, so it can be imported from any submission:
+
+    from results_writer import ResultsWriter
+
+    with ResultsWriter("results/module2.yaml") as results:
+        results["avg_test_score"] = df["testscr"].mean()
+        results["ols_slope"] = model.params["str"]
+
+Values are buffered and the file is written once, when the block ends (or when
+flush() is called). NumPy and pandas numbers are converted to plain numbers so
+the file contains human-readable values rather than Python objects.
+"""
+import json
+import math
+import os
+import re
+import tempfile
+
+
+def plain_value(value):
+    """Convert NumPy/pandas scalars to plain Python numbers and strings"""
+    # Single-precision floats: keep the shortest repr (654.1565, not 654.156494140625)
+    dtype = getattr(value, "dtype", None)
+    if dtype is not None and dtype.kind == "f" and dtype.itemsize < 8 and value.ndim == 0:
+        value = float(str(value))
+    # NumPy scalars (and 0-d arrays) provide .item() to get the Python equivalent
+    if hasattr(value, "item") and callable(value.item):
+        value = value.item()
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    raise TypeError(
+        f"Results must be numbers or strings, got {type(value).__name__}: {value!r}"
+    )
+
+
+def format_key(key: str) -> str:
+    if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", key):
+        return key
+    return json.dumps(key, ensure_ascii=False)
+
+
+def format_value(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ".nan"
+        if math.isinf(value):
+            return ".inf" if value > 0 else "-.inf"
+        return repr(value)
+    if isinstance(value, int):
+        return str(value)
+    # JSON strings are valid YAML strings
+    return json.dumps(value, ensure_ascii=False)
+
+
+class ResultsWriter:
+    """Buffer results and write them to a YAML file in a single atomic write"""
+
+    def __init__(self, path: str = "results/module2.yaml"):
+        self.path = path
+        self.values = {}
+
+    def __setitem__(self, key: str, value):
+        self.values[str(key)] = plain_value(value)
+
+    def __getitem__(self, key: str):
+        return self.values[key]
+
+    def add(self, key: str, value):
+        self[key] = value
+
+    def update(self, values: dict = None, **kwargs):
+        for key, value in dict(values or {}, **kwargs).items():
+            self[key] = value
+
+    def flush(self):
+        """Replace the results file with all buffered values"""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        text = "".join(
+            f"{format_key(key)}: {format_value(value)}\n" for key, value in self.values.items()
+        )
+
+        # Write to a temporary file in the same directory, then rename it over the
+        # results file, so the file is never left partially written
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".results-", suffix=".yaml")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Write results computed so far even if the code failed part way through
+        self.flush()
+        return False
+
+
+def write_results(path: str = "results/module2.yaml", values: dict = None, **kwargs):
+    """Write all results at once: write_results("results/module2.yaml", avg_test_score=654.2)"""
+    writer = ResultsWriter(path)
+    writer.update(values, **kwargs)
+    writer.flush()